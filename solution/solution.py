@@ -1,96 +1,299 @@
 import os
+import hashlib
+import numbers
+import functools
 import requests
-import glob
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 from datetime import datetime, date
-from io import StringIO
+
+try:
+    import ijson
+except ImportError:
+    # Sem o ijson instalado, a resposta da API é decodificada de uma só vez.
+    ijson = None
+
+try:
+    from numba import njit
+except ImportError:
+    # Sem o numba instalado, as funções decoradas rodam em Python puro.
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Sessão HTTP compartilhada, que reaproveita conexões e repete as requisições que falham com erro 5xx.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])),
+)
+
+# Frequências aceitas e o respectivo período usado para agrupar os dados.
+FREQUENCIES = {"day": "D", "daily": "D", "month": "M", "year": "Y"}
+
+# Formatos aceitos para salvar os resultados.
+SAVE_FORMATS = ("csv", "parquet", "feather")
+
+# Quantidade máxima de resultados de calc_amount mantidos em memória.
+RESULTS_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=32)
+def _format_date_range(start_date: date, end_date: date) -> tuple:
+    # Verifica se as datas são objetos de data válidos e se a data de início não é posterior à data de fim.
+    if not isinstance(start_date, date) or not isinstance(end_date, date):
+        raise TypeError("Inputs are in wrong format, should be date object")
+    if start_date >= end_date:
+        raise ValueError("start_date cannot be greater than end_date")
+    # Converte as datas para strings no formato "dd/mm/yyyy".
+    return start_date.strftime("%d/%m/%Y"), end_date.strftime("%d/%m/%Y")
+
+
+@njit(cache=True, fastmath=True)
+def _best_window(vals: np.ndarray, range_of: int, capital: float) -> tuple:
+    # Percorre as janelas de range_of dias atualizando o produto acumulado a cada passo,
+    # para os casos em que o valor de cada janela não se reduz a uma razão de produtos acumulados.
+    n = vals.size
+    # Sem essa verificação, o código compilado leria além do fim do array (o numba não checa os índices).
+    if range_of < 1 or range_of > n:
+        raise ValueError("range_of should be between 1 and the number of rows")
+    acc = 1.0
+    for j in range(range_of - 1):
+        acc *= 1.0 + vals[j]
+    best_value = acc * capital
+    best_i = 0
+    for i in range(1, n - range_of + 1):
+        acc = acc * (1.0 + vals[i + range_of - 2]) / (1.0 + vals[i - 1])
+        value = acc * capital
+        if value > best_value:
+            best_value = value
+            best_i = i
+    return best_i, best_value
 
 class SelicCalc:
     def __init__(self):
         # Define o caminho absoluto para o diretório atual.
         self._PATH = os.path.abspath(os.getcwd())
+        # Define o diretório usado como cache local das respostas da API.
+        self._cache_dir = os.path.join(self._PATH, ".selic_cache")
+        # Guarda os resultados de calc_amount já calculados, indexados pelos argumentos.
+        self._results = {}
+        # Fatores de crescimento e datas da última série processada por calc_amount.
+        self._growth = None
+        self._dates = None
 
     def earned(self, df: pd.DataFrame) -> pd.DataFrame:
         # Adiciona uma coluna que calcula o valor ganho baseado no capital inicial.
-        df["Amount earned"] = df["compound"] - self.capital
+        df["Amount earned"] = df["compound"].to_numpy() - self.capital
         return df
 
     def reshape_df(self, df: pd.DataFrame, frequency: str) -> pd.DataFrame:
         # Configura a coluna "data" como o índice do DataFrame.
         df.set_index("data", inplace=True)
         
-        # Agrupa os dados com base na frequência selecionada (mensal ou anual).
-        if frequency == "month":
-            df = df.groupby([df.index.year, df.index.month]).tail(1)
-        elif frequency == "year":
-            df = df.groupby([df.index.year]).tail(1)
-        
-        # Ordena o DataFrame pelo índice (data) e ajusta as colunas.
+        # Ordena pelo índice (data), pois o agrupamento mantém a ordem recebida (é barato se já estiver ordenado).
         df = df.sort_index()
+        
+        # Mantém a última observação de cada período da frequência selecionada (mensal ou anual).
+        period = FREQUENCIES[frequency]
+        if period != "D":
+            df = df.groupby(df.index.to_period(period)).tail(1)
+        
+        # Ajusta as colunas.
         df = self.earned(df)
         df.drop(["valor"], axis="columns", inplace=True)
         df.rename(columns={"compound": "Capital"}, inplace=True)
         df.index.names = ["Date"]
         return df
 
-    def is_valid_input(self, start_date: date, end_date: date, frequency: str) -> list:
-        # Verifica se o capital é um número válido (int ou float).
-        if not isinstance(self.capital, (float, int)):
-            raise Exception("capital should be int or float")
-        
-        # Verifica se as datas são objetos de data válidos e se a data de início não é posterior à data de fim.
-        if isinstance(start_date, (datetime, date)) and isinstance(end_date, (datetime, date)):
-            if start_date >= end_date:
-                raise Exception("start_date cannot be greater than end_date")
-            # Converte as datas para strings no formato "dd/mm/yyyy".
-            start_date_str = datetime.strftime(start_date, "%d/%m/%Y")
-            end_date_str = datetime.strftime(end_date, "%d/%m/%Y")
-            return [start_date_str, end_date_str]
-        else:
-            raise Exception("Inputs are in wrong format, should be date object")
-
-    def save_csv(self, df: pd.DataFrame, file_name: str):
-        # Verifica se o arquivo CSV já existe no diretório.
-        files_present = glob.glob(file_name)
-        if not files_present:
-            # Salva o DataFrame em um arquivo CSV se o arquivo não existir.
-            df.to_csv(file_name)
-            print(f"Path to csv output: {self._PATH}/{file_name}")
+    def is_valid_input(self, start_date: date, end_date: date, frequency: str, save_format: str = "csv") -> tuple:
+        # Verifica se o capital é um número real válido (int ou float).
+        if not isinstance(self.capital, numbers.Real):
+            raise TypeError("capital should be int or float")
+        
+        # Verifica se a frequência é uma das opções suportadas.
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"frequency should be one of {list(FREQUENCIES)}")
+        
+        # Verifica se o formato de saída é suportado.
+        if save_format not in SAVE_FORMATS:
+            raise ValueError(f"save_format should be one of {list(SAVE_FORMATS)}")
+        
+        # Valida as datas e as converte para strings (o resultado é memorizado por intervalo).
+        return _format_date_range(start_date, end_date)
+
+    def save_csv(self, df: pd.DataFrame, file_name: str, save_format: str = "csv"):
+        # Verifica se o formato de saída é suportado.
+        if save_format not in SAVE_FORMATS:
+            raise ValueError(f"save_format should be one of {list(SAVE_FORMATS)}")
+        
+        # Verifica se o arquivo já existe no diretório.
+        if not os.path.exists(file_name):
+            # Salva o DataFrame no formato escolhido se o arquivo não existir.
+            if save_format == "parquet":
+                df.to_parquet(file_name, engine="pyarrow", compression="zstd")
+            elif save_format == "feather":
+                # O formato feather não armazena índices, então o índice vira uma coluna.
+                if not isinstance(df.index, pd.RangeIndex):
+                    df = df.reset_index()
+                df.to_feather(file_name)
+            else:
+                df.to_csv(file_name)
+            print(f"Path to {save_format} output: {self._PATH}/{file_name}")
         else:
             print("File already exists, ignoring")
 
-    def calc_sum(self, start_date: date, end_date: date, df: pd.DataFrame) -> float:
-        # Filtra o DataFrame para o intervalo de datas fornecido.
-        _df = df[(df["data"] >= start_date) & (df["data"] <= end_date)]
-        # Calcula o valor acumulado para o capital investido.
-        _df["x"] = self.capital
-        _df["x"] = _df["x"] * _df["valor"].shift().add(1).cumprod().fillna(1)
-        val = _df.iloc[-1]["x"]
-        return val
-
-    def max_val_range(self, df: pd.DataFrame, range_of: int = 500):
-        # Encontra o melhor intervalo para investir dentro do DataFrame.
-        length = len(df) - range_of
-        best_start = None
-        best_end = None
-        best_value = 0
-        
-        # Itera sobre todos os possíveis intervalos no DataFrame.
-        for i in range(length):
-            start = df.iloc[i]["data"]
-            end = df.iloc[i + range_of - 1]["data"]
-            value = self.calc_sum(start, end, df)
-            # Atualiza o melhor intervalo se o valor acumulado for maior que o melhor registrado.
-            if value > best_value:
-                best_start = start
-                best_end = end
-                best_value = value
-        
-        # Imprime o intervalo de investimento ideal e o valor ganho.
-        print(
-            f"\nThe best day to invest is {best_start.date()}, with an amount earned of {best_value} after {range_of} "
-            f"days ({best_start.date()} to {best_end.date()})"
-        )
+    def fetch_selic(self, start_date_str: str, end_date_str: str, ignore_cache: bool = False) -> pd.DataFrame:
+        # Monta a URL para a API com o intervalo de datas.
+        base_url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados?formato=json&"
+        date_range_str = f"dataInicial={start_date_str}&dataFinal={end_date_str}"
+        url = base_url + date_range_str
+        
+        # Usa a resposta salva no cache local, se existir, evitando a chamada à API.
+        key = hashlib.sha1(url.encode()).hexdigest()
+        cache_path = os.path.join(self._cache_dir, f"{key}.parquet")
+        # O cache é opcional: sem pyarrow (ou fastparquet) instalado, os dados sempre vêm da API.
+        if not ignore_cache and os.path.exists(cache_path):
+            try:
+                return pd.read_parquet(cache_path)
+            except ImportError:
+                pass
+        
+        # Faz a solicitação para obter os dados da API, lendo a resposta em streaming.
+        # O timeout (conexão, leitura) evita que a chamada fique presa quando a API está sobrecarregada.
+        with _SESSION.get(url, stream=True, timeout=(3.05, 30)) as resp:
+            resp.raise_for_status()
+            
+            # Com o ijson, os registros são lidos incrementalmente, sem manter o JSON inteiro em memória.
+            if ijson is not None:
+                resp.raw.decode_content = True
+                records = ijson.items(resp.raw, "item")
+            else:
+                records = resp.json()
+            
+            # Pré-aloca os arrays pelo tamanho da resposta (cerca de 40 bytes por registro).
+            size = int(resp.headers.get("Content-Length", 0)) // 40 + 1
+            dates = np.empty(size, dtype="datetime64[D]")
+            vals = np.empty(size, dtype=np.float32)
+            
+            # Converte cada registro do JSON diretamente para os arrays tipados.
+            n = 0
+            for obj in records:
+                if n == size:
+                    # Dobra a capacidade dos arrays quando a estimativa não é suficiente.
+                    size *= 2
+                    dates = np.resize(dates, size)
+                    vals = np.resize(vals, size)
+                # Reordena "dd/mm/yyyy" para o formato ISO, que o numpy converte direto para datetime64.
+                day = obj["data"]
+                dates[n] = f"{day[6:10]}-{day[3:5]}-{day[0:2]}"
+                vals[n] = float(obj["valor"])
+                n += 1
+        
+        df = pd.DataFrame({"data": dates[:n], "valor": vals[:n]})
+        
+        # Salva o DataFrame já convertido no cache local, exceto quando o intervalo chega até hoje,
+        # pois a API ainda vai publicar as taxas que faltam.
+        if datetime.strptime(end_date_str, "%d/%m/%Y").date() < date.today():
+            try:
+                data = df.to_parquet()
+            except ImportError:
+                data = None
+            # O diretório só é criado quando há um engine de parquet disponível.
+            if data is not None:
+                os.makedirs(self._cache_dir, exist_ok=True)
+                with open(cache_path, "wb") as cache_file:
+                    cache_file.write(data)
+        return df
+
+    def growth_factors(self, df: pd.DataFrame) -> np.ndarray:
+        # Calcula o fator de crescimento acumulado de cada dia (a taxa de um dia rende a partir do dia seguinte).
+        # O produto é acumulado em float64: em float32, 1 + valor perderia a maior parte dos dígitos da taxa.
+        vals = df["valor"].to_numpy(dtype=np.float64)
+        growth = np.empty(len(vals))
+        growth[:1] = 1.0
+        np.cumprod(1.0 + vals[:-1], out=growth[1:])
+        return growth
+
+    def calc_sum(self, start_date: date, end_date: date, df: pd.DataFrame = None) -> float:
+        # Usa a série do DataFrame informado ou, na falta dele, a última série processada por calc_amount.
+        if df is not None:
+            growth = self.growth_factors(df)
+            dates = df["data"].to_numpy()
+        elif self._growth is not None:
+            growth = self._growth
+            dates = self._dates
+        else:
+            raise ValueError("df is required before calc_amount has been called")
+        
+        # Localiza as posições do primeiro e do último dia útil do intervalo nas datas da série.
+        i0 = np.searchsorted(dates, np.datetime64(start_date))
+        i1 = np.searchsorted(dates, np.datetime64(end_date), side="right") - 1
+        if not 0 <= i0 <= i1 < len(dates):
+            raise ValueError(f"no rows between start_date ({start_date}) and end_date ({end_date})")
+        # Calcula o valor acumulado para o capital investido a partir dos fatores de crescimento.
+        return self.capital * growth[i1] / growth[i0]
+
+    def _best_window_for(self, growth: np.ndarray, range_of: int) -> tuple:
+        # Calcula de uma só vez o rendimento de todos os possíveis intervalos de range_of dias.
+        ratios = growth[range_of - 1:] / growth[: growth.size - range_of + 1]
+        i = int(np.argmax(ratios))
+        return i, self.capital * ratios[i]
+
+    def max_val_range(
+        self,
+        df: pd.DataFrame,
+        ranges: tuple = (500,),
+        method: str = "cumprod",
+        growth: np.ndarray = None,
+    ):
+        # Encontra o melhor intervalo para investir dentro do DataFrame para cada tamanho de intervalo.
+        # Os fatores de crescimento podem ser informados já calculados para o mesmo DataFrame.
+        if isinstance(ranges, int):
+            ranges = (ranges,)
+        
+        # Verifica se a série tem dias suficientes para cada tamanho de intervalo.
+        for range_of in ranges:
+            if not 1 <= range_of <= len(df):
+                raise ValueError(f"range_of should be between 1 and the number of rows ({len(df)}), got {range_of}")
+        
+        dates = df["data"].to_numpy()
+        if method == "cumprod":
+            if growth is None:
+                growth = self.growth_factors(df)
+            if len(ranges) == 1:
+                results = [self._best_window_for(growth, ranges[0])]
+            else:
+                # Avalia os tamanhos de intervalo em paralelo; as threads compartilham o mesmo array de crescimento.
+                from joblib import Parallel, delayed
+                
+                results = Parallel(n_jobs=-1, prefer="threads")(
+                    delayed(self._best_window_for)(growth, range_of) for range_of in ranges
+                )
+        elif method == "loop":
+            # Percorre os intervalos um a um com o laço compilado pelo numba.
+            vals = df["valor"].to_numpy(dtype=np.float64)
+            results = [_best_window(vals, range_of, self.capital) for range_of in ranges]
+        else:
+            raise ValueError("method should be 'cumprod' or 'loop'")
+        
+        # Monta e imprime o melhor intervalo encontrado para cada tamanho de intervalo.
+        best_windows = []
+        for range_of, (i, best_value) in zip(ranges, results):
+            best_start = pd.Timestamp(dates[i]).date()
+            best_end = pd.Timestamp(dates[i + range_of - 1]).date()
+            best_windows.append((range_of, best_start, best_end, best_value))
+        self.print_best_windows(best_windows)
+        return best_windows
+
+    def print_best_windows(self, best_windows: list):
+        # Imprime o intervalo de investimento ideal e o valor ganho para cada tamanho de intervalo.
+        for range_of, best_start, best_end, best_value in best_windows:
+            print(
+                f"\nThe best day to invest is {best_start}, with an amount earned of {best_value} after {range_of} "
+                f"days ({best_start} to {best_end})"
+            )
 
     def calc_amount(
         self,
@@ -99,51 +302,63 @@ class SelicCalc:
         capital: float,
         frequency: str,
         save_csv: bool,
+        ignore_cache: bool = False,
+        save_format: str = "csv",
     ) -> pd.DataFrame:
         # Define o capital e valida a entrada.
         self.capital = capital
-        start_date_str, end_date_str = self.is_valid_input(start_date, end_date, frequency)
-        
-        # Monta a URL para a API com o intervalo de datas.
-        base_url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados?formato=json&"
-        date_range_str = f"dataInicial={start_date_str}&dataFinal={end_date_str}"
-        url = base_url + date_range_str
+        start_date_str, end_date_str = self.is_valid_input(start_date, end_date, frequency, save_format)
         
-        # Faz a solicitação para obter os dados da API.
-        resp = requests.get(url)
+        # Reaproveita o resultado de uma chamada anterior com os mesmos argumentos, quando não há arquivos a salvar.
+        key = (start_date, end_date, capital, frequency)
+        if not save_csv and not ignore_cache and key in self._results:
+            sol_df, self._growth, self._dates, best_windows = self._results[key]
+            self.print_best_windows(best_windows)
+            return sol_df.copy()
         
-        # Converte a resposta JSON para um DataFrame.
-        df = pd.read_json(StringIO(resp.text))
+        # Obtém os dados da API (ou do cache local) com o intervalo de datas.
+        df = self.fetch_selic(start_date_str, end_date_str, ignore_cache=ignore_cache)
         
-        # Converte a coluna "data" para o formato de data e a coluna "valor" para valores numéricos.
-        df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
-        df["valor"] = pd.to_numeric(df["valor"])
+        # Ordena o DataFrame (a ordenação estável é barata, pois a API já retorna as datas em ordem).
+        df = df.sort_values("data", kind="mergesort").reset_index(drop=True)
         
-        # Ordena o DataFrame e remove a primeira linha se a data não estiver dentro do intervalo desejado.
-        df.sort_values(by=["data"], inplace=True)
-        if df.iloc[0]["data"] < pd.to_datetime(start_date_str):
-            df.drop(index=df.index[0], axis=0, inplace=True)
+        # Remove as linhas com datas anteriores ao início do intervalo desejado.
+        k = np.searchsorted(df["data"].to_numpy(), np.datetime64(start_date))
+        if k > 0:
+            df = df.iloc[k:].reset_index(drop=True)
         
         # Converte a taxa de valor para porcentagem.
-        df["valor"] = df["valor"] / 100
+        # A taxa é mantida em float32, o que reduz pela metade a memória processada. Com ~7 dígitos
+        # significativos, cada taxa diária (~4e-4) é arredondada em até ~3e-11, então o valor acumulado
+        # pode diferir do cálculo em float64 em até ~3e-11 (relativo) por dia do intervalo, ou seja,
+        # cerca de 1e-8 em 500 dias. O produto acumulado e as colunas de capital ficam em float64.
+        df["valor"] = (df["valor"] / 100).astype(np.float32)
+        
+        # Calcula uma única vez os fatores de crescimento acumulado, reaproveitados pelos demais cálculos.
+        self._growth = self.growth_factors(df)
+        self._dates = df["data"].to_numpy()
         
         # Encontra o melhor intervalo de investimento.
-        self.max_val_range(df)
+        best_windows = self.max_val_range(df, growth=self._growth)
         
-        # Faz uma cópia do DataFrame para referência bruta.
-        df_raw = df.copy()
+        # Faz uma cópia do DataFrame para referência bruta, apenas se ela for salva.
+        df_raw = df.copy() if save_csv else None
         
         # Calcula o valor composto acumulado.
-        df["compound"] = capital
-        df["compound"] = df["compound"] * df["valor"].shift().add(1).cumprod().fillna(1)
+        df = self.compound_interest(df, growth=self._growth)
         
         # Ajusta o DataFrame para a frequência desejada.
         sol_df = self.reshape_df(df, frequency)
         
-        # Salva os DataFrames em arquivos CSV se solicitado.
+        # Salva os DataFrames em arquivos (CSV por padrão) se solicitado.
         if save_csv:
-            self.save_csv(sol_df, file_name="solution.csv")
-            self.save_csv(df_raw, file_name="df_raw.csv")
+            self.save_csv(sol_df, file_name=f"solution.{save_format}", save_format=save_format)
+            self.save_csv(df_raw, file_name=f"df_raw.{save_format}", save_format=save_format)
+        else:
+            # Guarda uma cópia do resultado, descartando o mais antigo quando o limite é atingido.
+            if len(self._results) >= RESULTS_CACHE_SIZE:
+                self._results.pop(next(iter(self._results)))
+            self._results[key] = (sol_df.copy(), self._growth, self._dates, best_windows)
         
         return sol_df
 
@@ -167,8 +382,10 @@ class SelicCalc:
         )
         print(info, df)
 
-    def compound_interest(self, df: pd.DataFrame) -> pd.DataFrame:
+    def compound_interest(self, df: pd.DataFrame, growth: np.ndarray = None) -> pd.DataFrame:
         # Calcula o valor composto acumulado para o DataFrame.
-        df["compound"] = self.capital
-        df["compound"] = df["compound"] * df["valor"].shift().add(1).cumprod().fillna(1)
+        # Os fatores de crescimento podem ser informados já calculados para o mesmo DataFrame.
+        if growth is None:
+            growth = self.growth_factors(df)
+        df["compound"] = self.capital * growth
         return df
@@ -0,0 +1,307 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from solution import solution
+from solution.solution import SelicCalc
+
+CAPITAL = 657.43
+
+
+def make_selic(start: str = "2010-01-08", periods: int = 700, increasing: bool = False) -> pd.DataFrame:
+    # Monta uma série diária no formato devolvido por fetch_selic (taxa em porcentagem, float32).
+    rng = np.random.default_rng(42)
+    valor = rng.uniform(0.01, 0.06, periods)
+    if increasing:
+        valor = np.sort(valor)
+    return pd.DataFrame({
+        "data": pd.bdate_range(start, periods=periods),
+        "valor": valor.astype(np.float32),
+    })
+
+
+def reference_best_window(df: pd.DataFrame, range_of: int) -> tuple:
+    # Implementação original: para cada janela, o capital rende pela taxa do dia anterior (shift + cumprod).
+    best = None
+    for i in range(len(df) - range_of + 1):
+        window = df.iloc[i:i + range_of]
+        value = CAPITAL * window["valor"].astype(np.float64).shift().add(1).cumprod().fillna(1).iloc[-1]
+        if best is None or value > best[2]:
+            best = (window["data"].iloc[0].date(), window["data"].iloc[-1].date(), value)
+    return best
+
+
+class FakeResponse:
+    # Resposta mínima da API, com o corpo JSON disponível em streaming (raw) e via json().
+    def __init__(self, payload: list, content_length: int):
+        self.body = json.dumps(payload).encode()
+        self.headers = {"Content-Length": str(content_length)}
+        self.raw = io.BytesIO(self.body)
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def api_payload(periods: int = 10) -> list:
+    # Registros no formato da API do BCB.
+    days = pd.bdate_range("2010-01-04", periods=periods)
+    return [{"data": day.strftime("%d/%m/%Y"), "valor": f"{0.04 + k / 1000:.6f}"} for k, day in enumerate(days)]
+
+
+class FetchSelicTest(unittest.TestCase):
+    def fetch(self, payload: list, content_length: int, **kwargs) -> pd.DataFrame:
+        # Executa fetch_selic com a sessão HTTP simulada e o cache em um diretório temporário.
+        calc = SelicCalc()
+        with tempfile.TemporaryDirectory() as tmp:
+            calc._cache_dir = tmp
+            get = mock.Mock(side_effect=lambda *args, **kw: FakeResponse(payload, content_length))
+            with mock.patch.object(solution._SESSION, "get", get):
+                return calc.fetch_selic("04/01/2010", "29/01/2010", **kwargs)
+
+    def assert_parsed(self, df: pd.DataFrame, payload: list):
+        self.assertEqual(len(df), len(payload))
+        self.assertEqual(df["data"].dtype.kind, "M")
+        self.assertEqual(df["valor"].dtype, np.float32)
+        self.assertEqual(df["data"].iloc[-1], pd.Timestamp("2010-01-15"))
+        self.assertAlmostEqual(float(df["valor"].iloc[-1]), 0.049, places=6)
+
+    @unittest.skipIf(solution.ijson is None, "ijson not installed")
+    def test_streaming_parse_grows_arrays(self):
+        # Content-Length baixo força a realocação dos arrays durante a leitura.
+        payload = api_payload()
+        self.assert_parsed(self.fetch(payload, content_length=40), payload)
+
+    def test_parse_without_ijson(self):
+        payload = api_payload()
+        with mock.patch.object(solution, "ijson", None):
+            self.assert_parsed(self.fetch(payload, content_length=40), payload)
+
+
+class FetchSelicCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.calc = SelicCalc()
+        self.calc._cache_dir = os.path.join(tmp.name, ".selic_cache")
+        self.payload = api_payload()
+        self.get = mock.Mock(side_effect=lambda *args, **kw: FakeResponse(self.payload, len(self.payload) * 40))
+        patcher = mock.patch.object(solution._SESSION, "get", self.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, end_date_str: str = "29/01/2010", **kwargs) -> pd.DataFrame:
+        return self.calc.fetch_selic("04/01/2010", end_date_str, **kwargs)
+
+    def test_second_call_uses_cache(self):
+        first = self.fetch()
+        second = self.fetch()
+        self.assertEqual(self.get.call_count, 1)
+        # O parquet guarda as datas em milissegundos, então só a resolução de datetime64 pode mudar.
+        pd.testing.assert_frame_equal(first, second, check_dtype=False, check_index_type=False)
+        self.assertEqual(second["valor"].dtype, np.float32)
+
+    def test_ignore_cache_fetches_again(self):
+        self.fetch()
+        self.fetch(ignore_cache=True)
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_open_range_is_not_cached(self):
+        self.fetch(end_date_str=date.today().strftime("%d/%m/%Y"))
+        self.assertFalse(os.path.exists(self.calc._cache_dir))
+
+    def test_missing_parquet_engine(self):
+        # Sem engine de parquet, os dados vêm da API e nenhum diretório de cache é criado.
+        error = ImportError("Unable to find a usable engine")
+        with mock.patch.object(pd.DataFrame, "to_parquet", side_effect=error):
+            self.assertEqual(len(self.fetch()), len(self.payload))
+            self.fetch()
+        self.assertEqual(self.get.call_count, 2)
+        self.assertFalse(os.path.exists(self.calc._cache_dir))
+
+    def test_unreadable_cache_falls_back_to_api(self):
+        self.fetch()
+        with mock.patch.object(pd, "read_parquet", side_effect=ImportError("Unable to find a usable engine")):
+            self.assertEqual(len(self.fetch()), len(self.payload))
+        self.assertEqual(self.get.call_count, 2)
+
+
+class SelicCalcTest(unittest.TestCase):
+    def calc_amount(self, raw: pd.DataFrame, frequency: str = "day", start_date: date = date(2010, 1, 11)):
+        # Executa calc_amount com fetch_selic simulado, devolvendo o resultado e o que foi impresso.
+        calc = SelicCalc()
+        out = io.StringIO()
+        with mock.patch.object(SelicCalc, "fetch_selic", return_value=raw.copy()), redirect_stdout(out):
+            df = calc.calc_amount(
+                start_date=start_date,
+                end_date=date(2013, 12, 31),
+                capital=CAPITAL,
+                frequency=frequency,
+                save_csv=False,
+            )
+        return calc, df, out.getvalue()
+
+    def test_rows_before_start_date_are_dropped(self):
+        # 11/01/2010 costumava ser lido como 1º de novembro; as linhas anteriores a 11 de janeiro são removidas.
+        _, df, _ = self.calc_amount(make_selic())
+        self.assertEqual(df.index[0].date(), date(2010, 1, 11))
+
+    def test_best_window_matches_reference(self):
+        raw = make_selic()
+        _, _, out = self.calc_amount(raw)
+        trimmed = raw[raw["data"] >= "2010-01-11"].reset_index(drop=True)
+        trimmed["valor"] = (trimmed["valor"] / 100).astype(np.float32)
+        best_start, best_end, best_value = reference_best_window(trimmed, 500)
+        self.assertIn(f"The best day to invest is {best_start}", out)
+        self.assertIn(f"({best_start} to {best_end})", out)
+        value = float(out.split("amount earned of ")[1].split(" ")[0])
+        self.assertAlmostEqual(value, best_value, places=8)
+
+    def test_last_window_is_searched(self):
+        # Com taxas crescentes, o melhor intervalo é o último possível.
+        raw = make_selic(increasing=True)
+        calc = SelicCalc()
+        calc.capital = CAPITAL
+        df = raw.assign(valor=(raw["valor"] / 100).astype(np.float32))
+        with redirect_stdout(io.StringIO()):
+            (range_of, best_start, best_end, best_value), = calc.max_val_range(df, 500)
+        self.assertEqual(best_start, df["data"].iloc[-500].date())
+        self.assertEqual(best_end, df["data"].iloc[-1].date())
+        self.assertAlmostEqual(best_value, reference_best_window(df, 500)[2], places=8)
+
+    def test_loop_method_matches_cumprod(self):
+        raw = make_selic()
+        calc = SelicCalc()
+        calc.capital = CAPITAL
+        df = raw.assign(valor=(raw["valor"] / 100).astype(np.float32))
+        with redirect_stdout(io.StringIO()):
+            cumprod = calc.max_val_range(df, (30, 250, 500))
+            loop = calc.max_val_range(df, (30, 250, 500), method="loop")
+        for expected, actual in zip(cumprod, loop):
+            self.assertEqual(expected[:3], actual[:3])
+            self.assertAlmostEqual(expected[3], actual[3], places=8)
+
+    def test_range_longer_than_series(self):
+        calc = SelicCalc()
+        calc.capital = CAPITAL
+        df = make_selic(periods=100)
+        for method in ("cumprod", "loop"):
+            with self.assertRaisesRegex(ValueError, r"number of rows \(100\), got 500"):
+                calc.max_val_range(df, 500, method=method)
+
+    def test_calc_sum(self):
+        calc, _, _ = self.calc_amount(make_selic())
+        dates = pd.Series(calc._dates)
+        # Os limites em fins de semana são ajustados para os dias úteis dentro do intervalo.
+        value = calc.calc_sum(date(2010, 1, 16), date(2010, 1, 24))
+        window = dates[(dates >= "2010-01-16") & (dates <= "2010-01-24")].index
+        self.assertAlmostEqual(value, CAPITAL * calc._growth[window[-1]] / calc._growth[window[0]])
+
+    def test_calc_sum_invalid_ranges(self):
+        calc, _, _ = self.calc_amount(make_selic())
+        for start_date, end_date in (
+            (date(2010, 1, 16), date(2010, 1, 17)),  # fim de semana, sem linhas
+            (date(2011, 1, 1), date(2010, 1, 1)),  # intervalo invertido
+            (date(2020, 1, 1), date(2020, 12, 31)),  # depois do fim da série
+        ):
+            with self.subTest(start_date=start_date, end_date=end_date):
+                with self.assertRaisesRegex(ValueError, "no rows between"):
+                    calc.calc_sum(start_date, end_date)
+
+    def test_reshape_df_frequencies(self):
+        raw = make_selic()
+        trimmed = raw[raw["data"] >= "2010-01-11"].reset_index(drop=True)
+        growth = np.cumprod(np.concatenate([[1.0], 1.0 + trimmed["valor"].to_numpy(np.float64)[:-1] / 100]))
+        expected = pd.Series(CAPITAL * growth, index=trimmed["data"])
+        for frequency, keys in (
+            ("day", lambda idx: idx),
+            ("month", lambda idx: [idx.year, idx.month]),
+            ("year", lambda idx: idx.year),
+        ):
+            with self.subTest(frequency=frequency):
+                _, df, _ = self.calc_amount(raw, frequency=frequency)
+                last = expected.groupby(keys(expected.index)).tail(1)
+                self.assertEqual(list(df.columns), ["Capital", "Amount earned"])
+                self.assertEqual(df.index.name, "Date")
+                self.assertTrue((df.index == last.index).all())
+                np.testing.assert_allclose(df["Capital"].to_numpy(), last.to_numpy(), rtol=1e-6)
+                np.testing.assert_allclose(df["Amount earned"].to_numpy(), last.to_numpy() - CAPITAL, atol=1e-3)
+
+    def test_compound_interest_uses_given_frame(self):
+        calc = SelicCalc()
+        calc.capital = 100.0
+        df = pd.DataFrame({"data": pd.bdate_range("2010-01-04", periods=4), "valor": np.full(4, 0.01)})
+        # Um vetor de crescimento antigo não deve ser usado quando nenhum é informado.
+        calc._growth = np.ones(4)
+        np.testing.assert_allclose(calc.compound_interest(df)["compound"], [100.0, 101.0, 102.01, 103.0301])
+
+    def test_reshape_df_sorts_input(self):
+        calc = SelicCalc()
+        calc.capital = CAPITAL
+        df = make_selic(periods=60)
+        df["compound"] = CAPITAL
+        df = df.sample(frac=1, random_state=0).reset_index(drop=True)
+        for frequency in ("day", "month"):
+            with self.subTest(frequency=frequency):
+                result = calc.reshape_df(df.copy(), frequency)
+                self.assertTrue(result.index.is_monotonic_increasing)
+
+    def test_save_formats_round_trip(self):
+        _, df, _ = self.calc_amount(make_selic(), frequency="month")
+        readers = {
+            "csv": lambda path: pd.read_csv(path, index_col="Date", parse_dates=["Date"]),
+            "parquet": pd.read_parquet,
+            # O feather não guarda o índice, que é salvo como a coluna "Date".
+            "feather": lambda path: pd.read_feather(path).set_index("Date"),
+        }
+        calc = SelicCalc()
+        with tempfile.TemporaryDirectory() as tmp:
+            for save_format, read in readers.items():
+                with self.subTest(save_format=save_format):
+                    path = os.path.join(tmp, f"solution.{save_format}")
+                    with redirect_stdout(io.StringIO()):
+                        calc.save_csv(df, file_name=path, save_format=save_format)
+                    pd.testing.assert_frame_equal(read(path), df, check_index_type=False, check_freq=False)
+
+    def test_invalid_save_format_fails_before_fetch(self):
+        with mock.patch.object(SelicCalc, "fetch_selic") as fetch:
+            for save_csv in (False, True):
+                with self.assertRaisesRegex(ValueError, "save_format"):
+                    SelicCalc().calc_amount(
+                        date(2010, 1, 11), date(2013, 12, 31), CAPITAL, "day", save_csv=save_csv, save_format="xlsx"
+                    )
+        fetch.assert_not_called()
+
+    def test_memoized_call_prints_report(self):
+        raw = make_selic()
+        calc = SelicCalc()
+        outputs = []
+        with mock.patch.object(SelicCalc, "fetch_selic", return_value=raw.copy()) as fetch:
+            for _ in range(2):
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    calc.calc_amount(date(2010, 1, 11), date(2013, 12, 31), CAPITAL, "day", save_csv=False)
+                outputs.append(out.getvalue())
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("The best day to invest is", outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()